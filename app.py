@@ -1,9 +1,17 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
+import numpy as np
 import folium
-from streamlit_folium import st_folium
+from folium.plugins import FastMarkerCluster, HeatMap
+import io
+import os
 import zipfile
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import plotly.express as px
+from to_parquet import CLAVE_HUELLA, huella
 
 # ------------------------------------------------------
 # 1. CONFIGURACIÓN DE LA PÁGINA
@@ -18,13 +26,37 @@ st.set_page_config(
 # 2. CARGA DE DATOS Y MAESTROS
 # ------------------------------------------------------
 
+def usar_parquet(archivo_parquet, archivo_origen):
+    """True si el Parquet existe y se generó a partir del contenido actual del origen.
+
+    to_parquet.py guarda en los metadatos del Parquet la huella (SHA-256) del origen.
+    Si no coincide (se ha editado o reemplazado el origen), se avisa y se lee el
+    origen para no servir datos desfasados.
+    """
+    if not os.path.exists(archivo_parquet):
+        return False
+    if not os.path.exists(archivo_origen):
+        return True
+    metadatos = pq.read_schema(archivo_parquet).metadata or {}
+    if metadatos.get(CLAVE_HUELLA) != huella(archivo_origen).encode():
+        st.warning(f"⚠️ '{archivo_parquet}' no corresponde al contenido actual de '{archivo_origen}'. "
+                   f"Se lee el original; ejecuta 'python to_parquet.py' para regenerar el Parquet.")
+        return False
+    return True
+
+@st.cache_data(show_spinner=False)
 def cargar_maestros():
     """Carga los metadatos y devuelve diccionarios para traducir IDs a Texto."""
     archivo_meta = 'master_data.xlsx'
+    archivo_meta_parquet = 'master_data.parquet'
     maestros = {}
 
     try:
-        df_meta = pd.read_excel(archivo_meta)
+        # El Parquet (generado con to_parquet.py) evita parsear el XML del Excel con openpyxl
+        if usar_parquet(archivo_meta_parquet, archivo_meta):
+            df_meta = pd.read_parquet(archivo_meta_parquet)
+        else:
+            df_meta = pd.read_excel(archivo_meta)
 
         # 1. Comunidades
         if 'idcomunidad' in df_meta.columns and 'comunidad' in df_meta.columns:
@@ -52,164 +84,353 @@ def cargar_maestros():
     
     return maestros
 
-@st.cache_data
-def cargar_datos():
-    archivo_zip = 'fires-all.csv.zip' 
-    
+# Columnas que realmente usa la app: el resto no se llega a leer (ni del Parquet ni del CSV).
+# 'idcausa' y 'causa_desc' son las alternativas que se prueban si no existe 'causa'.
+COLUMNAS_USADAS = ['fecha', 'idcomunidad', 'idprovincia', 'municipio', 'causa', 'idcausa',
+                   'causa_desc', 'superficie', 'gastos', 'perdidas', 'lat', 'lng']
+
+def columnas_a_leer(disponibles):
+    """Columnas de COLUMNAS_USADAS presentes en el fichero (las que falten se ignoran).
+
+    Si está 'causa' no se leen sus alternativas.
+    """
+    columnas = [col for col in disponibles if col in COLUMNAS_USADAS]
+    if 'causa' in columnas:
+        columnas = [col for col in columnas if col not in ('idcausa', 'causa_desc')]
+    return columnas
+
+# Tipos de las columnas del CSV (mismos anchos que se usan después en memoria)
+TIPOS_CSV = {
+    'fecha': pa.timestamp('ns'),
+    'idcomunidad': pa.int16(), 'idprovincia': pa.int16(), 'causa': pa.int16(),
+    'superficie': pa.float64(), 'gastos': pa.int32(), 'perdidas': pa.int32(),
+    'lat': pa.float32(), 'lng': pa.float32(),
+}
+
+# cache_resource: el DataFrame base se comparte entre sesiones sin copiarlo ni serializarlo
+# en cada llamada. Se trata como solo lectura; los subconjuntos derivados van por filtrar().
+@st.cache_resource(show_spinner="Cargando incendios…")
+def _cargar_datos_impl():
+    archivo_parquet = 'fires-all.parquet'
+    archivo_zip = 'fires-all.csv.zip'
+
     try:
         # 1. Cargamos diccionarios
         diccionarios = cargar_maestros()
-        
-        with zipfile.ZipFile(archivo_zip) as z:
-            archivos_csv = [f for f in z.namelist() if f.endswith('.csv') and '__MACOSX' not in f]
-            
-            if not archivos_csv:
-                return pd.DataFrame()
-
-            with z.open(archivos_csv[0]) as f:
-                df = pd.read_csv(f, parse_dates=['fecha'], index_col='fecha')
-                
-                # --- TRADUCCIÓN ROBUSTA (Conversion de Tipos) ---
-                # Convertimos a numérico antes de mapear para evitar errores de tipo (texto vs numero)
-                
-                # 1. COMUNIDADES
-                if 'idcomunidad' in df.columns:
-                    # Forzamos a numero, los errores se vuelven NaN
-                    df['idcomunidad'] = pd.to_numeric(df['idcomunidad'], errors='coerce')
-                    if 'comunidades' in diccionarios:
-                        df['nombre_comunidad'] = df['idcomunidad'].map(diccionarios['comunidades'])
-                        # Rellenamos los que no crucen con el ID original
-                        df['nombre_comunidad'] = df['nombre_comunidad'].fillna(df['idcomunidad'].astype(str))
-                else:
-                    df['nombre_comunidad'] = "Desconocido"
-
-                # 2. PROVINCIAS
-                if 'idprovincia' in df.columns:
-                    df['idprovincia'] = pd.to_numeric(df['idprovincia'], errors='coerce')
-                    if 'provincias' in diccionarios:
-                        df['nombre_provincia'] = df['idprovincia'].map(diccionarios['provincias'])
-                        df['nombre_provincia'] = df['nombre_provincia'].fillna(df['idprovincia'].astype(str))
-                else:
-                    df['nombre_provincia'] = "Desconocido"
-
-                # 3. CAUSAS
-                # IMPORTANTE: Revisa si tu columna en el CSV de incendios es 'causa' (general 1-6)
-                # o 'causa_desc' (detallada 200-400).
-                # Aquí intentamos usar 'causa' (general) primero porque coincide con tu master_data
-                col_causa_id = 'causa' 
-                
-                # Si no existe 'causa', probamos 'idcausa' o 'causa_desc'
-                if col_causa_id not in df.columns:
-                     if 'idcausa' in df.columns: col_causa_id = 'idcausa'
-                     elif 'causa_desc' in df.columns: col_causa_id = 'causa_desc'
-
-                if col_causa_id in df.columns:
-                    df[col_causa_id] = pd.to_numeric(df[col_causa_id], errors='coerce')
-                    if 'causas' in diccionarios:
-                        df['causa_texto'] = df[col_causa_id].map(diccionarios['causas'])
-                        df['causa_texto'] = df['causa_texto'].fillna("Causa " + df[col_causa_id].astype(str))
-                    else:
-                         df['causa_texto'] = df[col_causa_id]
-                else:
-                    df['causa_texto'] = "No especificado"
-
-                # Conversión de numéricos para cálculos
-                cols_num = ['superficie', 'gastos', 'perdidas', 'lat', 'lng']
-                for col in cols_num:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-                return df
+
+        if usar_parquet(archivo_parquet, archivo_zip):
+            # Parquet (generado con to_parquet.py): columnar y ya tipado, sin parsear texto
+            columnas = columnas_a_leer(pq.read_schema(archivo_parquet).names)
+            df = pd.read_parquet(archivo_parquet, columns=columnas, dtype_backend='pyarrow')
+        else:
+            # Alternativa: CSV comprimido original
+            with zipfile.ZipFile(archivo_zip) as z:
+                archivos_csv = [f for f in z.namelist() if f.endswith('.csv') and '__MACOSX' not in f]
+
+                if not archivos_csv:
+                    return pd.DataFrame(), []
+
+                # Leemos el fichero entero de una vez y el parser (multihilo con pyarrow)
+                # trabaja sobre un buffer contiguo en vez de ir descomprimiendo a trozos
+                datos = z.read(archivos_csv[0])
+
+            # Lector CSV de pyarrow (multihilo) con los tipos ya fijados: no hace falta
+            # convertir columnas a numérico después. Solo se convierten las columnas usadas,
+            # tomadas de la cabecera tal como la lee pyarrow (BOM y comillas incluidos)
+            cabecera = pacsv.open_csv(io.BytesIO(datos)).schema.names
+            conversion = pacsv.ConvertOptions(column_types=TIPOS_CSV, include_columns=columnas_a_leer(cabecera))
+            tabla = pacsv.read_csv(io.BytesIO(datos), convert_options=conversion)
+            df = tabla.to_pandas(types_mapper=pd.ArrowDtype)
+
+        # Índice temporal como DatetimeIndex (no Arrow) para poder usar .year y resample
+        df['fecha'] = df['fecha'].astype('datetime64[ns]')
+        # Índice ordenado: los rangos de años se sacan con searchsorted (ver por_años)
+        df = df.set_index('fecha').sort_index()
+
+        # --- TRADUCCIÓN ROBUSTA (Conversion de Tipos) ---
+        # Convertimos a numérico antes de cruzar para evitar errores de tipo (texto vs numero)
+
+        # IMPORTANTE: Revisa si tu columna en el CSV de incendios es 'causa' (general 1-6)
+        # o 'causa_desc' (detallada 200-400).
+        # Aquí intentamos usar 'causa' (general) primero porque coincide con tu master_data
+        col_causa_id = 'causa'
+
+        # Si no existe 'causa', probamos 'idcausa' o 'causa_desc'
+        if col_causa_id not in df.columns:
+            if 'idcausa' in df.columns: col_causa_id = 'idcausa'
+            elif 'causa_desc' in df.columns: col_causa_id = 'causa_desc'
+
+        # (columna con el ID, diccionario del maestro, columna de nombre, valor si no hay columna de ID)
+        traducciones = [
+            ('idcomunidad', 'comunidades', 'nombre_comunidad', "Desconocido"),
+            ('idprovincia', 'provincias', 'nombre_provincia', "Desconocido"),
+            (col_causa_id, 'causas', 'causa_texto', "No especificado"),
+        ]
+
+        for col_id, clave, col_nombre, por_defecto in traducciones:
+            if col_id not in df.columns:
+                df[col_nombre] = por_defecto
+                continue
+
+            # Forzamos a numero, los errores se vuelven NaN
+            df[col_id] = pd.to_numeric(df[col_id], errors='coerce', downcast='integer')
+            if clave not in diccionarios:
+                df[col_nombre] = df[col_id]
+                continue
+
+            # Tabla de consulta pequeña (ID -> nombre categórico) cruzada con un join hash;
+            # el resultado ya es categórico: códigos enteros en vez de un str por fila
+            ids = pd.Index(list(diccionarios[clave].keys())).astype('int64').rename(col_id)
+            tabla = pd.DataFrame({col_nombre: pd.Categorical(list(diccionarios[clave].values()))}, index=ids)
+            df = df.join(tabla, on=col_id)
+            # Los IDs que no crucen con el maestro quedan como "Desconocido"
+            df[col_nombre] = df[col_nombre].cat.add_categories(['Desconocido']).fillna('Desconocido')
+
+        # Gastos y pérdidas sin dato cuentan como 0: se rellena aquí una vez y no en cada suma
+        cols_importes = [col for col in ['gastos', 'perdidas'] if col in df.columns]
+        df[cols_importes] = df[cols_importes].fillna(0)
+
+        # Tipos más estrechos: menos memoria y sumas más rápidas.
+        # Los importes son euros enteros (int32 basta; la suma acumula en int64).
+        # lat/lng en float32 conservan ~1 m de precisión. La superficie se deja en
+        # float64 porque su total (millones de ha) se muestra con dos decimales.
+        for col in cols_importes:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        for col in ['lat', 'lng']:
+            if col in df.columns:
+                df[col] = df[col].astype('float32')
+
+        # Columnas para filtros y gráficos, calculadas una sola vez: año entero y textos como categóricas
+        df['year'] = df.index.year.astype('int16')
+        for col in ['municipio', 'nombre_comunidad', 'nombre_provincia', 'causa_texto']:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+
+        # Años disponibles para el slider: constantes mientras el DataFrame base esté en caché
+        años = sorted(df['year'].unique().tolist())
+
+        return df, años
                 
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), []
 
-df = cargar_datos()
+df, años = _cargar_datos_impl()
 
 if df.empty:
-    st.info("Esperando datos. Asegúrate de tener 'fires-all.csv.zip' y 'master_data.xlsx'.")
+    st.info("Esperando datos. Asegúrate de tener 'fires-all.parquet' (o 'fires-all.csv.zip') y 'master_data.xlsx'.")
     st.stop()
 
 # ------------------------------------------------------
 # 3. BARRA LATERAL (FILTROS)
 # ------------------------------------------------------
+
+# Límite de entradas de las cachés por combinación de filtros: cada entrada guarda un
+# DataFrame o HTML de varios MB y el número de combinaciones posibles es enorme
+MAX_ENTRADAS_CACHE = 32
+
+def por_años(min_y, max_y):
+    """Vista de `df` entre dos años (incluidos) sobre el índice de fechas ordenado.
+
+    Dos búsquedas binarias en vez de una máscara booleana sobre todo el índice.
+    """
+    lo = df.index.searchsorted(pd.Timestamp(f'{min_y}-01-01'))
+    hi = df.index.searchsorted(pd.Timestamp(f'{max_y + 1}-01-01'))
+    return df.iloc[lo:hi]
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS_CACHE)
+def filtrar(min_y, max_y, com, prov, muni):
+    """Devuelve el subconjunto de incendios para una combinación de filtros.
+
+    Solo recibe escalares, así la clave de caché es barata; el DataFrame base
+    se toma del nivel de módulo en lugar de pasarlo (y hashearlo) como argumento.
+    """
+    d = por_años(min_y, max_y)
+    if com != "Todas":
+        d = d[d['nombre_comunidad'] == com]
+    if prov != "Todas":
+        d = d[d['nombre_provincia'] == prov]
+    if muni != "Todos":
+        d = d[d['municipio'] == muni]
+    return d
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS_CACHE)
+def opciones(col, min_y, max_y, com="Todas", prov="Todas"):
+    """Lista ordenada de valores de `col` presentes con los filtros anteriores.
+
+    Se lee de las categorías usadas (códigos enteros), sin comparar cadenas fila a
+    fila, y se devuelve solo la lista: no se copia ningún DataFrame intermedio.
+    """
+    d = por_años(min_y, max_y)
+    mascara = np.ones(len(d), dtype=bool)
+    if com != "Todas":
+        mascara &= (d['nombre_comunidad'] == com).to_numpy()
+    if prov != "Todas":
+        mascara &= (d['nombre_provincia'] == prov).to_numpy()
+    return sorted(d.loc[mascara, col].cat.remove_unused_categories().cat.categories.tolist())
+
 st.sidebar.header("🔍 Filtros de Búsqueda")
 
 # A. Filtro por Años
-años = sorted(df.index.year.unique())
 min_year, max_year = st.sidebar.select_slider("Rango de años", options=años, value=(min(años), max(años)))
-df_filtrado = df[(df.index.year >= min_year) & (df.index.year <= max_year)]
 
 # B. Filtros Geográficos (USANDO LOS NOMBRES)
-# Comunidad
-lista_comunidades = ["Todas"] + sorted(df_filtrado['nombre_comunidad'].astype(str).unique().tolist())
+# Cada nivel ofrece solo las opciones presentes con los filtros anteriores.
+lista_comunidades = ["Todas"] + opciones('nombre_comunidad', min_year, max_year)
 comunidad_sel = st.sidebar.selectbox("Comunidad Autónoma", lista_comunidades)
 
-if comunidad_sel != "Todas":
-    df_filtrado = df_filtrado[df_filtrado['nombre_comunidad'] == comunidad_sel]
-
-# Provincia
-lista_provincias = ["Todas"] + sorted(df_filtrado['nombre_provincia'].astype(str).unique().tolist())
+lista_provincias = ["Todas"] + opciones('nombre_provincia', min_year, max_year, comunidad_sel)
 provincia_sel = st.sidebar.selectbox("Provincia", lista_provincias)
 
-if provincia_sel != "Todas":
-    df_filtrado = df_filtrado[df_filtrado['nombre_provincia'] == provincia_sel]
-
-# Municipio
-lista_municipios = ["Todos"] + sorted(df_filtrado['municipio'].astype(str).unique().tolist())
+lista_municipios = ["Todos"] + opciones('municipio', min_year, max_year, comunidad_sel, provincia_sel)
 municipio_sel = st.sidebar.selectbox("Municipio", lista_municipios)
 
-if municipio_sel != "Todos":
-    df_filtrado = df_filtrado[df_filtrado['municipio'] == municipio_sel]
-
 # ------------------------------------------------------
 # 4. DASHBOARD 
 # ------------------------------------------------------
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS_CACHE)
+def stats(min_y, max_y, com, prov, muni):
+    """KPIs y datos de los gráficos para una combinación de filtros.
+
+    Al mover el slider adelante y atrás, las combinaciones ya vistas no se recalculan.
+    """
+    d = filtrar(min_y, max_y, com, prov, muni)
+
+    # Agrupar por la columna entera 'year' es más barato que resample sobre el índice de fechas
+    anual = (d.groupby('year', observed=True, sort=True)['superficie']
+             .sum().rename_axis('fecha').reset_index())
+
+    causas = None
+    if 'causa_texto' in d.columns:
+        # Sobre una categórica se cuentan códigos enteros; las categorías sin incendios salen con 0
+        conteo = d['causa_texto'].value_counts()
+        causas = conteo[conteo > 0].head(10).reset_index()
+        causas.columns = ['Causa', 'Incidentes']
+
+    return {
+        'n': len(d),
+        # Las tres sumas en una sola reducción
+        'sumas': d[['superficie', 'gastos', 'perdidas']].sum().to_dict(),
+        'anual': anual,
+        'causas': causas,
+    }
+
+@st.cache_data(show_spinner=False, max_entries=MAX_ENTRADAS_CACHE)
+def build_map_html(min_y, max_y, com, prov, muni):
+    """HTML del mapa para una combinación de filtros (None si no hay coordenadas).
+
+    Se cachea el HTML ya generado: las recargas que no cambian los filtros
+    no vuelven a construir ni serializar el mapa de Folium.
+    """
+    d = filtrar(min_y, max_y, com, prov, muni)
+
+    # Para el mapa, quitamos los que no tienen coordenadas y agrupamos los incendios que caen
+    # en la misma celda de ~1 km (2 decimales): al zoom inicial (6) un píxel ya mide ~2 km.
+    # Se redondea en float64: un float32 redondeado se serializa con 17 dígitos
+    cols_texto = {col: (col, 'first') for col in ['municipio', 'nombre_provincia', 'causa_texto'] if col in d.columns}
+    df_mapa = (
+        d.dropna(subset=['lat', 'lng'])
+        .assign(lat_q=lambda t: t['lat'].astype('float64').round(2),
+                lng_q=lambda t: t['lng'].astype('float64').round(2))
+        .groupby(['lat_q', 'lng_q'], as_index=False)
+        .agg(superficie=('superficie', 'sum'), n=('superficie', 'size'), **cols_texto)
+        .rename(columns={'lat_q': 'lat', 'lng_q': 'lng'})
+    )
+
+    if df_mapa.empty:
+        return None
+
+    centro = [df_mapa['lat'].mean(), df_mapa['lng'].mean()]
+    # prefer_canvas: Leaflet dibuja todos los puntos en un único <canvas> en vez de un nodo SVG por punto
+    m = folium.Map(location=centro, zoom_start=6, prefer_canvas=True)
+
+    # Vista general: mapa de calor de densidad de incendios (peso = incendios en cada punto)
+    HeatMap(df_mapa[['lat', 'lng', 'n']].values.tolist(), name="Densidad de incendios", radius=10, blur=15).add_to(m)
+
+    # Los puntos uno a uno solo cuando son pocos; con más, el mapa de calor basta
+    if len(df_mapa) < 2000:
+        # Color según gravedad (superficie quemada en el punto), calculado de una vez para toda la columna
+        colores = pd.cut(
+            df_mapa['superficie'], bins=[-np.inf, 10, 50, np.inf], labels=['green', 'orange', 'darkred']
+        ).astype(object).fillna('green')
+
+        # Popups montados columna a columna con operaciones de texto de pandas, sin bucle Python por fila
+        def texto(col, defecto):
+            return df_mapa[col].astype(str) if col in df_mapa.columns else defecto
+
+        popups = ('<b>Incendios:</b> ' + df_mapa['n'].astype(str)
+                  + '<br><b>Muni:</b> ' + texto('municipio', '')
+                  + '<br><b>Prov:</b> ' + texto('nombre_provincia', '')
+                  + '<br><b>Sup:</b> ' + df_mapa['superficie'].round(2).astype(str)
+                  + ' ha<br><b>Causa:</b> ' + texto('causa_texto', 'N/A'))
+
+        puntos = list(zip(df_mapa['lat'].tolist(), df_mapa['lng'].tolist(), colores.tolist(), popups.tolist()))
+
+        if len(puntos) > 500:
+            # Muchos puntos: un único cluster que construye los marcadores en el navegador
+            callback = """
+            function (row) {
+                var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+                    radius: 4, color: row[2], fillColor: row[2], fill: true, fillOpacity: 0.7
+                });
+                marker.bindPopup(row[3], {maxWidth: 200});
+                return marker;
+            }
+            """
+            FastMarkerCluster(data=puntos, callback=callback, name="Incendios").add_to(m)
+        else:
+            # Pocos puntos: una sola capa GeoJSON con todos los incendios
+            fc = {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "geometry": {"type": "Point", "coordinates": [lng, lat]},
+                        "properties": {"color": color, "popup": popup},
+                    }
+                    for lat, lng, color, popup in puntos
+                ],
+            }
+            folium.GeoJson(
+                fc,
+                name="Incendios",
+                marker=folium.CircleMarker(radius=4, fill=True),
+                style_function=lambda f: {"color": f["properties"]["color"], "fillColor": f["properties"]["color"], "fillOpacity": 0.7},
+                popup=folium.GeoJsonPopup(fields=["popup"], labels=False, max_width=200),
+            ).add_to(m)
+
+        # Capas activables por separado (mapa de calor / puntos)
+        folium.LayerControl().add_to(m)
+    else:
+        st.caption(f"{len(df_mapa):,} puntos: se muestra el mapa de calor. Filtra por provincia o municipio para ver los incendios uno a uno.")
+
+    return m.get_root().render()
+
 st.title("🔥 Visualización de Incendios en España")
 st.markdown(f"Mostrando datos: **{min_year}** - **{max_year}**")
 
+resumen = stats(min_year, max_year, comunidad_sel, provincia_sel, municipio_sel)
+sumas = resumen['sumas']
+
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("Total Incendios", f"{len(df_filtrado):,}")
-col2.metric("Superficie (ha)", f"{df_filtrado['superficie'].sum():,.2f}")
-col3.metric("Gastos Extinción", f"{df_filtrado['gastos'].fillna(0).sum():,.0f} €") 
-col4.metric("Pérdidas Económicas", f"{df_filtrado['perdidas'].fillna(0).sum():,.0f} €")
+col1.metric("Total Incendios", f"{resumen['n']:,}")
+col2.metric("Superficie (ha)", f"{sumas['superficie']:,.2f}")
+col3.metric("Gastos Extinción", f"{sumas['gastos']:,.0f} €")
+col4.metric("Pérdidas Económicas", f"{sumas['perdidas']:,.0f} €")
 
 st.divider()
 
 # --- MAPA ---
 st.subheader(f"📍 Mapa de incidentes")
-# Para el mapa, quitamos los que no tienen coordenadas
-df_mapa = df_filtrado.dropna(subset=['lat', 'lng'])
-
-if not df_mapa.empty:
-    if len(df_mapa) > 2000:
-        st.warning(f"⚠️ Hay {len(df_mapa)} puntos. Se muestran los primeros 1000 para optimizar.")
-        df_mapa = df_mapa.head(1000) 
-    
-    centro = [df_mapa['lat'].mean(), df_mapa['lng'].mean()]
-    m = folium.Map(location=centro, zoom_start=6)
-
-    for i, row in df_mapa.iterrows():
-        sup = row['superficie']
-        color = "darkred" if sup > 50 else "orange" if sup > 10 else "green"
-
-        # Popup
-        html_popup = f"""
-        <b>Muni:</b> {row.get('municipio', '')}<br>
-        <b>Prov:</b> {row.get('nombre_provincia', '')}<br>
-        <b>Sup:</b> {sup:.2f} ha<br>
-        <b>Causa:</b> {row.get('causa_texto', 'N/A')}
-        """
-        
-        folium.CircleMarker(
-            location=[row['lat'], row['lng']],
-            radius=4, 
-            popup=folium.Popup(html_popup, max_width=200),
-            color=color, fill=True, fill_opacity=0.7
-        ).add_to(m)
-
-    st_folium(m, width="100%", height=500)
+html_mapa = build_map_html(min_year, max_year, comunidad_sel, provincia_sel, municipio_sel)
+if html_mapa is not None:
+    # st.iframe solo existe en versiones recientes de Streamlit; en las anteriores
+    # se usa components.html (obsoleto en las nuevas)
+    if hasattr(st, 'iframe'):
+        st.iframe(html_mapa, height=500)
+    else:
+        components.html(html_mapa, height=500)
 else:
     st.info("No hay datos con coordenadas para mostrar en el mapa.")
 
@@ -220,7 +441,7 @@ c1, c2 = st.columns(2)
 
 with c1:
     st.subheader("📈 Evolución Anual")
-    df_anual = df_filtrado.resample('YE')['superficie'].sum().reset_index()
+    df_anual = resumen['anual']
     if not df_anual.empty:
         st.plotly_chart(
             px.line(df_anual, x='fecha', y='superficie', markers=True), 
@@ -229,10 +450,9 @@ with c1:
 
 with c2:
     st.subheader("📋 Causas")
-    if 'causa_texto' in df_filtrado.columns:
-        conteo = df_filtrado['causa_texto'].value_counts().reset_index()
-        conteo.columns = ['Causa', 'Incidentes']
+    conteo = resumen['causas']
+    if conteo is not None:
         st.plotly_chart(
-            px.pie(conteo.head(10), values='Incidentes', names='Causa', hole=0.4), 
+            px.pie(conteo, values='Incidentes', names='Causa', hole=0.4), 
             use_container_width=True
         )
@@ -0,0 +1,65 @@
+"""Convierte una sola vez 'fires-all.csv.zip' y 'master_data.xlsx' a Parquet.
+
+Uso: python to_parquet.py
+
+La app lee los Parquet (columnares y ya tipados) en lugar de volver a
+descomprimir y parsear el CSV o el Excel en cada arranque.
+"""
+import hashlib
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ARCHIVO_ZIP = 'fires-all.csv.zip'
+ARCHIVO_PARQUET = 'fires-all.parquet'
+ARCHIVO_META = 'master_data.xlsx'
+ARCHIVO_META_PARQUET = 'master_data.parquet'
+
+# Columnas de texto repetitivas: se guardan con codificación de diccionario
+COLS_TEXTO = ['municipio']
+
+# Clave de los metadatos del Parquet con la huella del fichero de origen. La app la
+# compara con el origen actual para saber si el Parquet está desfasado (las fechas de
+# modificación no sirven: git no las conserva)
+CLAVE_HUELLA = b'origen_sha256'
+
+
+def huella(ruta):
+    """SHA-256 (hex) del contenido de un fichero."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def escribir_parquet(df, destino, origen, **opciones):
+    """Escribe `df` en `destino` guardando en sus metadatos la huella de `origen`."""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadatos = {**(tabla.schema.metadata or {}), CLAVE_HUELLA: huella(origen).encode()}
+    pq.write_table(tabla.replace_schema_metadata(metadatos), destino, **opciones)
+
+
+def main():
+    with zipfile.ZipFile(ARCHIVO_ZIP) as z:
+        archivos_csv = [f for f in z.namelist() if f.endswith('.csv') and '__MACOSX' not in f]
+        with z.open(archivos_csv[0]) as f:
+            df = pd.read_csv(f, parse_dates=['fecha'])
+
+    # Todo lo que no es fecha ni texto es numérico; lo tipamos aquí para no hacerlo en la app
+    for col in df.columns:
+        if col != 'fecha' and col not in COLS_TEXTO:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    escribir_parquet(df, ARCHIVO_PARQUET, ARCHIVO_ZIP, compression='zstd', use_dictionary=COLS_TEXTO)
+    print(f"Escrito '{ARCHIVO_PARQUET}' ({len(df):,} filas).")
+
+    df_meta = pd.read_excel(ARCHIVO_META)
+    escribir_parquet(df_meta, ARCHIVO_META_PARQUET, ARCHIVO_META)
+    print(f"Escrito '{ARCHIVO_META_PARQUET}' ({len(df_meta):,} filas).")
+
+
+if __name__ == '__main__':
+    main()